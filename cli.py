@@ -84,6 +84,7 @@ Example usage:
     parser.add_argument('--optimize-images', action='store_true', help='Shrink images')
     
     # General stuff
+    parser.add_argument('--no-cache', action='store_true', help="Don't reuse or save results in ~/.cache/doc2tex")
     parser.add_argument('-v', '--verbose', action='store_true', help='Show more logs')
     parser.add_argument('--version', action='version', version='doc2tex 1.0.0')
     
@@ -101,6 +102,7 @@ def build_options(args: argparse.Namespace) -> ConversionOptions:
         preserve_images=not args.no_images,
         optimize_images=args.optimize_images,
         verbose=args.verbose,
+        use_cache=not args.no_cache,
     )
 
 
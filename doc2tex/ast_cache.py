@@ -0,0 +1,103 @@
+# Small on-disk cache for DOCX -> LaTeX results
+# Opening a .docx means unzipping it and parsing all the XML, which is the slow part.
+# If you convert the same file with the same settings again (happens a lot when
+# rebuilding a report), we just reuse the LaTeX we made last time.
+
+import os
+import time
+import shutil
+import hashlib
+from typing import Optional
+
+from .options import ConversionOptions
+from .utils import logger
+
+
+def _default_cache_dir() -> str:
+    # Per user, in the usual cache folder, so nobody else on a shared machine
+    # can read your converted reports (it used to live in /tmp)
+    base = (os.environ.get('XDG_CACHE_HOME') or os.environ.get('LOCALAPPDATA')
+            or os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'doc2tex', 'ast-cache')
+
+
+CACHE_DIR = _default_cache_dir()
+
+# Old entries are thrown away after a week
+CACHE_TTL = 7 * 24 * 3600
+
+# Bump this whenever the LaTeX we generate changes, so results from an older
+# version of doc2tex don't get reused
+CACHE_VERSION = 2
+
+# Settings that don't change the LaTeX we write, so they're left out of the key
+_NOT_IN_KEY = ('verbose', 'use_cache', 'parallel', 'max_workers', 'clean_temp_files')
+
+# Looking for expired entries means listing the whole folder, so only do it
+# every hour or so (the time is kept as the mtime of this file)
+_SWEEP_STAMP = '.last-sweep'
+_SWEEP_INTERVAL = CACHE_TTL // 24
+
+
+def make_key(data: bytes, opts: ConversionOptions) -> str:
+    # Hash of the file bytes plus the settings, so changing either one misses.
+    # Takes the bytes (not the path) so the caller parses exactly what was hashed.
+    settings = {k: v for k, v in opts.to_dict().items() if k not in _NOT_IN_KEY}
+    h = hashlib.sha256(f"doc2tex-v{CACHE_VERSION}\0".encode('utf-8'))
+    h.update(data)
+    h.update(repr(settings).encode('utf-8'))
+    return h.hexdigest()
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, key + '.tex')
+
+
+def _is_expired(path: str, now: float) -> bool:
+    return now - os.path.getmtime(path) > CACHE_TTL
+
+
+def load(key: str) -> Optional[str]:
+    # Returns the path of the cached .tex, or None if we don't have a fresh copy
+    path = _entry_path(key)
+    try:
+        if _is_expired(path, time.time()):
+            os.remove(path)
+            return None
+    except OSError:
+        return None
+    return path
+
+
+def store(key: str, tex_path: str) -> None:
+    # Save a copy of the result for next time. If this fails it's not a big deal.
+    path = _entry_path(key)
+    try:
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+        os.chmod(CACHE_DIR, 0o700) # in case it was made before with looser permissions
+        # Copy to a temp name first so nobody reads a half-written file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        shutil.copyfile(tex_path, tmp)
+        os.replace(tmp, path)
+        _drop_expired()
+    except OSError as e:
+        logger.debug(f"Couldn't write to the cache: {e}")
+
+
+def _drop_expired() -> None:
+    # Deletes entries past their TTL so the folder doesn't keep growing
+    now = time.time()
+    stamp = os.path.join(CACHE_DIR, _SWEEP_STAMP)
+    try:
+        if now - os.path.getmtime(stamp) < _SWEEP_INTERVAL:
+            return
+    except OSError:
+        pass # never swept yet
+    with open(stamp, 'w'):
+        pass
+    for entry in os.scandir(CACHE_DIR):
+        try:
+            if entry.is_file() and now - entry.stat().st_mtime > CACHE_TTL:
+                os.remove(entry.path)
+        except OSError:
+            pass
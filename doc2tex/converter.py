@@ -2,8 +2,11 @@
 # You can use the CLI or the Web UI, but they both use this class eventually.
 
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from typing import Optional, List
+from docx import Document
 
 from .options import ConversionOptions
 from .latex import LatexGenerator
@@ -12,6 +15,14 @@ from .utils import logger, is_valid_file, cleanup_temp_dir, get_file_info
 from .errors import ConversionError, InvalidFileFormatError
 
 
+# Which way to convert based on the input extension
+_EXT_TO_DIR = {
+    'docx': 'to_latex',
+    'tex': 'to_docx',
+    'latex': 'to_docx',
+}
+
+
 class DocTeXConverter:
     """
     This is my main converter class.
@@ -34,6 +45,14 @@ class DocTeXConverter:
             logger.setLevel('DEBUG')
             logger.debug("Okay, verbose mode is ON. Let's see what happens.")
     
+    def warmup(self) -> None:
+        # Does the one-time work of a first conversion ahead of time, so whoever
+        # converts first doesn't wait for it (the web app calls this at startup).
+        # Opening a blank Document reads python-docx's built-in template from disk,
+        # and the preamble for our settings gets built and cached.
+        Document()
+        LatexGenerator(self.settings)._make_preamble()
+    
     def convert(
         self, 
         input_file: str, 
@@ -77,13 +96,11 @@ class DocTeXConverter:
             raise
     
     def _guess_direction(self, path: str) -> str:
-        # Checkextension and guess
+        # Check extension and guess
         ext = Path(path).suffix.lower().lstrip('.')
-        if ext == 'docx':
-            return 'to_latex'
-        elif ext in ['tex', 'latex']:
-            return 'to_docx'
-        else:
+        try:
+            return _EXT_TO_DIR[ext]
+        except KeyError:
             raise InvalidFileFormatError(f"I don't know what to do with .{ext} files. Sorry!")
             
     def _calc_output_path(self, path: str, dir: str) -> str:
@@ -117,22 +134,78 @@ class DocTeXConverter:
 
     def batch(self, files: list, out_dir: Optional[str] = None) -> list:
         # This is useful if you have a whole folder of reports to convert
-        results = []
+        # Every file is independent, so we can spread them over all the CPU cores
+        jobs = []
         for f in files:
             try:
-                # If they gave us a target folder, put it there
-                if out_dir:
-                    os.makedirs(out_dir, exist_ok=True)
-                    name = Path(f).stem
-                    # We have to guess the direction again for the extension
-                    d = self._guess_direction(f)
-                    ext = '.tex' if d == 'to_latex' else '.docx'
-                    target = os.path.join(out_dir, name + ext)
-                else:
-                    target = None
-                    
-                results.append(self.convert(f, target))
+                # Guess the direction once here and hand it to convert()
+                # so it doesn't have to do it again
+                d = self._guess_direction(f)
             except Exception as e:
                 logger.warning(f"Skipping {f} because: {e}")
-                results.append(None)
-        return results
+                d = None
+                
+            # If they gave us a target folder, put it there
+            target = None
+            if out_dir and d:
+                os.makedirs(out_dir, exist_ok=True)
+                name = Path(f).stem
+                ext = '.tex' if d == 'to_latex' else '.docx'
+                target = os.path.join(out_dir, name + ext)
+                
+            jobs.append((f, target, d))
+        
+        todo = [j for j in jobs if j[2]]
+        if self.settings.parallel and len(todo) > 1:
+            # Each worker builds its own converter from our settings
+            done = self._convert_in_pool(todo)
+        else:
+            done = [self._convert_or_none(*j) for j in todo]
+        
+        # Put the results back in the same order as the input files
+        done_iter = iter(done)
+        return [next(done_iter) if d else None for _, _, d in jobs]
+    
+    def _convert_in_pool(self, todo: list) -> list:
+        # Runs the batch on a process pool, one future per file.
+        # If a worker dies (out of memory, lxml crash...) the pool is broken and every
+        # file still in it fails too, so those get another go, each in its own
+        # one-worker pool. That way only the file that really crashes is lost.
+        done = [None] * len(todo)
+        retry = []
+        with ProcessPoolExecutor(max_workers=self.settings.max_workers) as ex:
+            futures = {ex.submit(_convert_one, self.settings, *j): i for i, j in enumerate(todo)}
+            for fut in as_completed(futures):
+                i = futures[fut]
+                try:
+                    done[i] = fut.result()
+                except BrokenProcessPool:
+                    retry.append(i)
+                except Exception as e:
+                    logger.warning(f"Skipping {todo[i][0]} because: {e}")
+        
+        for i in sorted(retry):
+            try:
+                with ProcessPoolExecutor(max_workers=1) as ex:
+                    done[i] = ex.submit(_convert_one, self.settings, *todo[i]).result()
+            except Exception as e:
+                logger.warning(f"Skipping {todo[i][0]} because: {e}")
+        return done
+    
+    def _convert_or_none(self, f: str, target: Optional[str], d: str) -> Optional[str]:
+        # One bad file shouldn't stop the whole batch
+        try:
+            return self.convert(f, target, forced_direction=d)
+        except Exception as e:
+            logger.warning(f"Skipping {f} because: {e}")
+            return None
+
+
+def _convert_one(
+    settings: ConversionOptions,
+    f: str,
+    target: Optional[str],
+    d: str
+) -> Optional[str]:
+    # Runs inside a worker process for batch(), so it needs its own converter
+    return DocTeXConverter(settings)._convert_or_none(f, target, d)
@@ -5,6 +5,7 @@
 
 import os
 import re
+import mmap
 from typing import List, Dict, Optional, Tuple, Any
 from pathlib import Path
 from docx import Document
@@ -16,24 +17,75 @@ from .utils import unescape_latex, logger, ensure_directory
 from .errors import ConversionError
 
 
+# Markers around the part of the .tex file we actually convert
+_BEGIN_DOC = '\\begin{document}'
+_END_DOC = '\\end{document}'
+_BEGIN_DOC_B = _BEGIN_DOC.encode('ascii')
+_END_DOC_B = _END_DOC.encode('ascii')
+
+# All the regexes we use, compiled once when the module loads
+# (re has a cache too, but it gets flushed when batching lots of files)
+_BLOCK_SPLIT_RE = re.compile(r'\n\s*\n')
+_HEADING_RE = re.compile(r'\\(?:sub)*section\{([^}]+)\}')
+# Inline formatting tags in one pattern, the group name tells us which one matched.
+# Math is simple inline math between $$
+_INLINE_RE = re.compile(
+    r'\\textbf\{(?P<bold>[^}]+)\}'
+    r'|\\textit\{(?P<italic>[^}]+)\}'
+    r'|\\underline\{(?P<underline>[^}]+)\}'
+    r'|\$(?P<math>[^$]+)\$'
+)
+_TABULAR_RE = re.compile(r'\\begin\{tabular\}\{[^}]+\}(.*?)\\end\{tabular\}', re.DOTALL)
+_INCLUDEGRAPHICS_RE = re.compile(r'\\includegraphics(?:\[[^\]]+\])?\{([^}]+)\}')
+_ITEM_SPLIT_RE = re.compile(r'\\item\s+')
+_CENTER_RE = re.compile(r'\\begin\{center\}(.*?)\\end\{center\}', re.DOTALL)
+
+
+
+def _extract_body(content: str) -> str:
+    # Returns what's between \begin{document} and \end{document}.
+    # If we can't find it, we just take everything (maybe it's just a snippet?)
+    # Plain str.find is way faster than a regex on a huge .tex file.
+    begin = content.find(_BEGIN_DOC)
+    end = content.find(_END_DOC, begin) if begin != -1 else -1
+    if end != -1:
+        return content[begin + len(_BEGIN_DOC):end]
+    return content
+
+
 class DocxGenerator:
     """
     My class for generating Word docs from LaTeX.
     It's basically a simple parser that looks for commands like \section or \textbf.
     """
     
+    __slots__ = ('options', 'word_doc', '_font_size_pt', '_img_width', '_dir_cache')
+    
     def __init__(self, options: ConversionOptions):
         self.options = options
         self.word_doc = None
         
+        # Pull font size from options (usually 12pt), just stripping 'pt'
+        try:
+            sz = int(options.font_size.value.rstrip('pt'))
+        except ValueError:
+            sz = 12 # fallback
+        self._font_size_pt = Pt(sz)
+        
+        # Every picture goes in at the same width
+        self._img_width = Inches(4)
+        
+        # Folder -> names of the files in it, so we list each image folder once
+        # instead of checking every picture on disk separately
+        self._dir_cache = {}
+        
     def convert(self, tex_file: str, docx_file: str) -> str:
         # Tries to turn your .tex into a .docx
         try:
             logger.info(f"Trying to read {tex_file}...")
             
-            # Read all the text
-            with open(tex_file, 'r', encoding=self.options.output_encoding) as f:
-                raw_tex = f.read()
+            # Read the part of the file we care about
+            tex_body = self._read_body(tex_file)
             
             # Create a blank Word document
             self.word_doc = Document()
@@ -42,7 +94,7 @@ class DocxGenerator:
             self._apply_student_styles()
             
             # This is where the magic (or mess) happens
-            self._parse_and_build(raw_tex)
+            self._parse_and_build(tex_body)
             
             # Save the result
             self.word_doc.save(docx_file)
@@ -59,30 +111,37 @@ class DocxGenerator:
         style = self.word_doc.styles['Normal']
         f = style.font
         f.name = 'Times New Roman'
-        
-        # Pull font size from options (usually 12pt)
-        try:
-             # Just stripping 'pt' if it's there
-             sz = int(self.options.font_size.value.replace('pt', ''))
-             f.size = Pt(sz)
-        except:
-             f.size = Pt(12) # fallback
+        f.size = self._font_size_pt
 
-    def _parse_and_build(self, content: str) -> None:
+    def _read_body(self, tex_file: str) -> str:
         # We only really care about stuff inside \begin{document}
-        # If we can't find it, we just take everything
-        pattern = r'\\begin\{document\}(.*?)\\end\{document\}'
-        match = re.search(pattern, content, re.DOTALL)
+        # The file is memory-mapped so we can find the markers on the raw bytes
+        # and only decode the body, instead of reading a huge thesis into one string.
+        enc = self.options.output_encoding
+        with open(tex_file, 'rb') as f:
+            # mmap doesn't like empty files
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                begin = mm.find(_BEGIN_DOC_B)
+                end = mm.find(_END_DOC_B, begin) if begin != -1 else -1
+                if end != -1:
+                    content = mm[begin + len(_BEGIN_DOC_B):end].decode(enc)
+                else:
+                    # Markers not found as plain bytes (snippet, or an encoding
+                    # like UTF-16), so decode everything and look again
+                    content = _extract_body(mm[:].decode(enc))
         
-        if match:
-            doc_body = match.group(1).strip()
-        else:
-            # Maybe it's just a snippet?
-            doc_body = content.strip()
-            
+        # Reading in text mode used to do this for us
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        return content.strip()
+
+    def _parse_and_build(self, doc_body: str) -> None:
+        # doc_body is what's inside \begin{document} (see _read_body)
         # I split the body into blocks by double newlines
         # This usually means separate paragraphs or sections in LaTeX
-        blocks = re.split(r'\n\s*\n', doc_body)
+        blocks = _BLOCK_SPLIT_RE.split(doc_body)
         
         for bk in blocks:
             bk = bk.strip()
@@ -110,7 +169,7 @@ class DocxGenerator:
 
     def _add_heading(self, block: str, level: int) -> None:
         # Extract text from \section{...} or \subsection{...}
-        m = re.search(r'\\(?:sub)*section\{([^}]+)\}', block)
+        m = _HEADING_RE.search(block)
         if m:
             title = unescape_latex(m.group(1))
             self.word_doc.add_heading(title, level=level)
@@ -122,44 +181,26 @@ class DocxGenerator:
 
     def _apply_inline(self, text: str, para_obj) -> None:
         # This is my favorite part: a simple inline 'parser'
-        # It looks for formatting tags and adds them as 'runs'
+        # It looks for formatting tags and adds them as 'runs'.
+        # One pass over the text with a single regex, so long paragraphs stay fast.
         
-        # These are the things we support right now
-        patterns = [
-            (r'\\textbf\{([^}]+)\}', 'bold'),
-            (r'\\textit\{([^}]+)\}', 'italic'),
-            (r'\\underline\{([^}]+)\}', 'underline'),
-            (r'\$([^$]+)\$', 'math'), # Simple inline math between $$
-        ]
+        # Most paragraphs have no commands or math at all, so that's just one run
+        # (no backslash also means there's nothing to unescape)
+        if '\\' not in text and '$' not in text:
+            if text:
+                para_obj.add_run(text)
+            return
         
         idx = 0
-        while idx < len(text):
-            found_m = None
-            found_type = None
-            
-            # Check all patterns to see which one comes next in the string
-            for pat, t in patterns:
-                m = re.search(pat, text[idx:])
-                if m:
-                    if not found_m or m.start() < found_m.start():
-                        found_m = m
-                        found_type = t
-            
-            if not found_m:
-                # No more formatting tags, just add the rest and finish
-                rest = unescape_latex(text[idx:])
-                if rest:
-                    para_obj.add_run(rest)
-                break
-                
+        for m in _INLINE_RE.finditer(text):
             # Add the text BEFORE the formatting tag
-            pre = unescape_latex(text[idx : idx + found_m.start()])
+            pre = unescape_latex(text[idx:m.start()])
             if pre:
                 para_obj.add_run(pre)
             
             # Handle the actual formatted text
-            content = unescape_latex(found_m.group(1))
-            run = para_obj.add_run(content)
+            found_type = m.lastgroup
+            run = para_obj.add_run(unescape_latex(m.group(found_type)))
             
             if found_type == 'bold':
                 run.bold = True
@@ -172,11 +213,16 @@ class DocxGenerator:
                 run.italic = True
                 
             # Move the index past this match
-            idx += found_m.end()
+            idx = m.end()
+        
+        # No more formatting tags, just add the rest
+        rest = unescape_latex(text[idx:])
+        if rest:
+            para_obj.add_run(rest)
 
     def _add_table(self, block: str) -> None:
         # Tries to rebuild a table from tabular
-        tab_m = re.search(r'\\begin\{tabular\}\{[^}]+\}(.*?)\\end\{tabular\}', block, re.DOTALL)
+        tab_m = _TABULAR_RE.search(block)
         if not tab_m:
              return
              
@@ -198,39 +244,66 @@ class DocxGenerator:
         t = self.word_doc.add_table(rows=len(lines), cols=num_c)
         t.style = 'Table Grid'
         
+        # t.rows and row.cells build new wrapper objects every time you touch them,
+        # so grab them once instead of inside the loop
+        word_rows = list(t.rows)
         for r_idx, r_text in enumerate(lines):
-            cells = [unescape_latex(c.strip()) for c in r_text.split('&')]
-            for c_idx, val in enumerate(cells):
-                if c_idx < num_c:
-                     t.rows[r_idx].cells[c_idx].text = val
+            cells_obj = word_rows[r_idx].cells
+            vals = [unescape_latex(c.strip()) for c in r_text.split('&')][:num_c]
+            for c_idx, val in enumerate(vals):
+                cells_obj[c_idx].text = val
 
     def _add_image(self, block: str) -> None:
         # Looks for \includegraphics and adds the picture to Word
-        m = re.search(r'\\includegraphics(?:\[[^\]]+\])?\{([^}]+)\}', block)
+        m = _INCLUDEGRAPHICS_RE.search(block)
         if m:
             img_path = m.group(1)
             # We check if the file actually exists
-            if os.path.exists(img_path):
+            if self._image_exists(img_path):
                  try:
-                      self.word_doc.add_picture(img_path, width=Inches(4))
-                 except:
+                      self.word_doc.add_picture(img_path, width=self._img_width)
+                 except Exception:
+                      # Broken or unsupported picture, but keep going with the rest
                       self.word_doc.add_paragraph(f"[Image found but error loading: {img_path}]")
             else:
                  self.word_doc.add_paragraph(f"[Image file not found: {img_path}]")
 
+    def _image_exists(self, img_path: str) -> bool:
+        # Looks the file up in a cached listing of its folder
+        d, name = os.path.split(img_path)
+        d = d or '.'
+        entries = self._dir_cache.get(d)
+        if entries is None:
+            try:
+                entries = frozenset(os.listdir(d))
+            except OSError:
+                entries = frozenset()
+            self._dir_cache[d] = entries
+        # Not in the listing under that exact name can still mean it exists on
+        # Windows/macOS, where 'Plot.PNG' finds 'plot.png', so ask the OS then
+        return name in entries or os.path.exists(img_path)
+
     def _add_list(self, block: str) -> None:
         # Reconstructs bullet/numbered lists
         is_num = '\\begin{enumerate}' in block
-        # Find every \item text
-        items = re.findall(r'\\item\s+(.*?)(?=\\item|\n|\\end)', block, re.DOTALL)
+        style = 'List Number' if is_num else 'List Bullet'
         
-        for it in items:
-            style = 'List Number' if is_num else 'List Bullet'
-            p = self.word_doc.add_paragraph(style=style)
-            self._apply_inline(it.strip(), p)
+        # Split on \item (the first chunk is the \begin{...} line before it).
+        # Each item's text runs until the end of its line, or an \end / \item
+        for part in _ITEM_SPLIT_RE.split(block)[1:]:
+            cut = len(part)
+            for stop in ('\n', '\\end', '\\item'):
+                i = part.find(stop, 0, cut)
+                if i != -1:
+                    cut = i
+            
+            it = part[:cut].strip()
+            if it:
+                p = self.word_doc.add_paragraph(style=style)
+                self._apply_inline(it, p)
 
     def _add_centered(self, block: str) -> None:
-        m = re.search(r'\\begin\{center\}(.*?)\\end\{center\}', block, re.DOTALL)
+        m = _CENTER_RE.search(block)
         if m:
              txt = m.group(1).strip()
              p = self.word_doc.add_paragraph()
@@ -3,39 +3,39 @@
 
 class DocTeXError(Exception):
     # Base error class
-    pass
+    __slots__ = ()
 
 
 class ConversionError(DocTeXError):
     # When conversion fails
-    pass
+    __slots__ = ()
 
 
 class FileNotFoundError(DocTeXError):
     # When input file doesn't exist
-    pass
+    __slots__ = ()
 
 
 class InvalidFileFormatError(DocTeXError):
     # When file format is wrong
-    pass
+    __slots__ = ()
 
 
 class InvalidOptionsError(DocTeXError):
     # When options are invalid
-    pass
+    __slots__ = ()
 
 
 class ImageProcessingError(DocTeXError):
     # When image stuff fails
-    pass
+    __slots__ = ()
 
 
 class LatexCompilationError(DocTeXError):
     # When LaTeX won't compile
-    pass
+    __slots__ = ()
 
 
 class UnicodeHandlingError(DocTeXError):
     # When Unicode/encoding breaks
-    pass
+    __slots__ = ()
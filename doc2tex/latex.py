@@ -2,9 +2,11 @@
 # This is the part that actually writes the .tex file.
 # Note: Word's structure is a mess compared to LaTeX, so we have to do some guessing.
 
+import io
 import os
 import re
-from typing import List, Dict, Optional, Tuple, Any
+import shutil
+from typing import List, Dict, Optional, Tuple, Any, Iterator, TextIO
 from pathlib import Path
 from docx import Document
 from docx.shared import Pt, RGBColor
@@ -20,6 +22,17 @@ from .utils import (
     optimize_image, sanitize_filename, get_temp_dir
 )
 from .errors import ConversionError, ImageProcessingError
+from . import ast_cache
+
+
+# Word heading styles and the LaTeX command each one turns into.
+# Anything deeper than Heading 4 ends up as \subparagraph.
+_HEADING_MAP = {
+    'Heading 1': '\\section',
+    'Heading 2': '\\subsection',
+    'Heading 3': '\\subsubsection',
+    'Heading 4': '\\paragraph',
+}
 
 
 class LatexGenerator:
@@ -29,6 +42,16 @@ class LatexGenerator:
     manually like you do with Pandoc sometimes.
     """
     
+    # Fixed set of attributes, so instances stay small when batching lots of files
+    __slots__ = (
+        'options', 'bib_list', 'img_idx', 'footer_idx', 'temp_workspace',
+        '_is_report', '_style_name_cache',
+    )
+    
+    # Preambles we already built, keyed by the options they depend on.
+    # Shared by all instances since the same settings give the same preamble.
+    _PREAMBLE_CACHE = {}
+    
     def __init__(self, options: ConversionOptions):
         self.options = options
         self.bib_list = [] # Stores bibliography entries we find
@@ -36,24 +59,54 @@ class LatexGenerator:
         self.footer_idx = 0
         self.temp_workspace = None
         
+        # Reports and theses start every Heading 1 on a fresh page
+        self._is_report = options.document_type.value in ("report", "thesis")
+        
+        # Style id from the XML -> style name, since para.style has to go
+        # looking through the document's styles every time
+        self._style_name_cache = {}
+        
     def convert(self, docx_path: str, tex_path: str) -> str:
         # The main function called by the converter
         try:
             logger.info(f"Wait, converting {docx_path} now...")
             
+            # Maybe we already converted this exact file with these settings
+            cache_key = None
+            source = docx_path
+            if self.options.use_cache:
+                # Read it once and parse those same bytes below, so the cache key
+                # matches what we converted even if the file changes in between
+                with open(docx_path, 'rb') as f:
+                    source = io.BytesIO(f.read())
+                cache_key = ast_cache.make_key(source.getvalue(), self.options)
+                cached = ast_cache.load(cache_key)
+                if cached is not None:
+                    logger.info("Seen this one before, reusing the cached LaTeX")
+                    shutil.copyfile(cached, tex_path)
+                    return tex_path
+            
             # Load the actual word file
-            my_doc = Document(docx_path)
+            my_doc = Document(source)
             
             # If the user wants images, we need a place to put them
             if self.options.preserve_images:
                 self.temp_workspace = get_temp_dir()
             
-            # Build the latex string
-            full_latex = self._build_document(my_doc, tex_path)
+            # Write the latex straight into the file, block by block,
+            # so we never hold the whole thing in memory for big documents
+            try:
+                with open(tex_path, 'w', encoding=self.options.output_encoding,
+                          buffering=1 << 20) as target:
+                    self._stream_document(my_doc, tex_path, target)
+            except Exception:
+                # Don't leave a half-written .tex lying around
+                if os.path.exists(tex_path):
+                    os.remove(tex_path)
+                raise
             
-            # Save it to the file
-            with open(tex_path, 'w', encoding=self.options.output_encoding) as target:
-                target.write(full_latex)
+            if cache_key:
+                ast_cache.store(cache_key, tex_path)
             
             # Handle bibliography if we found any entries
             if self.options.extract_bibliography and self.bib_list:
@@ -66,32 +119,45 @@ class LatexGenerator:
             logger.error(f"Ugh, something broke: {err}")
             raise ConversionError(f"Conversion failed mid-way: {err}")
     
-    def _build_document(self, doc: Document, path: str) -> str:
-        # Puts together the preamble and the body
-        output_chunks = []
+    def _stream_document(self, doc: Document, path: str, out: TextIO) -> None:
+        # Writes the preamble and the body to 'out' as we go
         
         # 1. The Preamble (all the setup stuff)
         if self.options.include_preamble and self.options.standalone_document:
-            output_chunks.append(self._make_preamble())
+            out.write(self._make_preamble())
+            out.write("\n")
         
         # 2. Start of document
         if self.options.standalone_document:
-            output_chunks.append("\\begin{document}\n")
+            out.write("\\begin{document}\n\n")
         
-        # 3. The actual content
+        # 3. The actual content, with a blank line between blocks
         # I iterate through the body elements to keep the order correct
-        body_tex = self._parse_body(doc, path)
-        output_chunks.append(body_tex)
+        first = True
+        for block in self._parse_body(doc, path):
+            if not first:
+                out.write("\n\n")
+            out.write(block)
+            first = False
         
         # 4. Wrap it up
         if self.options.standalone_document:
-            output_chunks.append("\n\\end{document}")
-        
-        return '\n'.join(output_chunks)
+            out.write("\n\n\\end{document}")
     
     def _make_preamble(self) -> str:
         # This is where we set up the LaTeX packages.
         # I added some extra ones that usually help with engineering reports.
+        opts = self.options
+        key = (
+            opts.document_type, opts.font_size, opts.unicode_support,
+            opts.page_margins, opts.preserve_images, opts.line_spacing,
+            opts.extract_bibliography, opts.bibliography_style,
+            tuple(opts.custom_packages),
+        )
+        cached = LatexGenerator._PREAMBLE_CACHE.get(key)
+        if cached is not None:
+            return cached
+        
         lines = []
         
         d_type = self.options.document_type.value
@@ -139,29 +205,28 @@ class LatexGenerator:
         for pkg in self.options.custom_packages:
             lines.append(f"\\usepackage{{{pkg}}}")
         
-        return '\n'.join(lines) + '\n'
+        preamble = '\n'.join(lines) + '\n'
+        LatexGenerator._PREAMBLE_CACHE[key] = preamble
+        return preamble
     
-    def _parse_body(self, doc: Document, path: str) -> str:
+    def _parse_body(self, doc: Document, path: str) -> Iterator[str]:
         # Loop over every item in the document body
-        # Paragraphs and Tables are the main things here
-        final_lines = []
-        
+        # Paragraphs and Tables are the main things here.
+        # This is a generator so each block can be written out right away.
         for el in doc.element.body:
             # Check if it's a paragraph
             if isinstance(el, CT_P):
                 p_obj = Paragraph(el, doc)
                 p_tex = self._handle_paragraph(p_obj)
                 if p_tex:
-                    final_lines.append(p_tex)
+                    yield p_tex
             
             # Check if it's a table
             elif isinstance(el, CT_Tbl):
                 t_obj = Table(el, doc)
                 t_tex = self._handle_table(t_obj)
                 if t_tex:
-                    final_lines.append(t_tex)
-        
-        return '\n\n'.join(final_lines)
+                    yield t_tex
     
     def _handle_paragraph(self, para: Paragraph) -> str:
         # Turns a single line of text into LaTeX
@@ -169,8 +234,9 @@ class LatexGenerator:
             return "" # Ignore empty lines
         
         # If it's a heading, handle it separately
-        if para.style.name.startswith('Heading'):
-            return self._handle_heading(para)
+        s_name = self._style_name(para)
+        if s_name.startswith('Heading'):
+            return self._handle_heading(para, s_name)
         
         # Break the paragraph into 'runs' (bits with different formatting)
         tex_pieces = []
@@ -201,80 +267,71 @@ class LatexGenerator:
         # Word calls them 'CENTER' and 'RIGHT'
         try:
             align = para.alignment
-            if align == WD_PARAGRAPH_ALIGNMENT.CENTER:
-                clean_text = f"\\begin{{center}}\n{clean_text}\n\\end{{center}}"
-            elif align == WD_PARAGRAPH_ALIGNMENT.RIGHT:
-                clean_text = f"\\begin{{flushright}}\n{clean_text}\n\\end{{flushright}}"
-        except:
-            # Sometimes alignment is 'None' or some weird value, just ignore it
-            pass
+        except ValueError:
+            # Sometimes the XML has some weird value python-docx can't read, just ignore it
+            align = None
+        
+        if align == WD_PARAGRAPH_ALIGNMENT.CENTER:
+            clean_text = f"\\begin{{center}}\n{clean_text}\n\\end{{center}}"
+        elif align == WD_PARAGRAPH_ALIGNMENT.RIGHT:
+            clean_text = f"\\begin{{flushright}}\n{clean_text}\n\\end{{flushright}}"
             
         return clean_text
     
-    def _handle_heading(self, para: Paragraph) -> str:
+    def _style_name(self, para: Paragraph) -> str:
+        # Looks up the paragraph's style name, remembering it per style id
+        sid = para._p.style
+        name = self._style_name_cache.get(sid)
+        if name is None:
+            name = para.style.name
+            self._style_name_cache[sid] = name
+        return name
+    
+    def _handle_heading(self, para: Paragraph, s_name: str) -> str:
         # Maps Word headings to LaTeX sections
         txt = escape_latex(para.text)
-        s_name = para.style.name
+        
+        # Style names look like 'Heading 2', so the first 9 chars pick the level
+        cmd = _HEADING_MAP.get(s_name[:9], '\\subparagraph')
         
         # I added some 'Smart' detection for sections that usually start on new pages
-        prefix = ""
-        if "Heading 1" in s_name and self.options.document_type.value in ["report", "thesis"]:
-             # reports usually start Heading 1 on a fresh page
-             prefix = "\\clearpage\n"
-             
-        if 'Heading 1' in s_name:
-            return f"{prefix}\\section{{{txt}}}"
-        elif 'Heading 2' in s_name:
-            return f"\\subsection{{{txt}}}"
-        elif 'Heading 3' in s_name:
-            return f"\\subsubsection{{{txt}}}"
-        elif 'Heading 4' in s_name:
-            return f"\\paragraph{{{txt}}}"
-        else:
-            return f"\\subparagraph{{{txt}}}"
+        prefix = "\\clearpage\n" if cmd == '\\section' and self._is_report else ""
+        
+        return f"{prefix}{cmd}{{{txt}}}"
     
     def _handle_table(self, tbl: Table) -> str:
         # Reconstructs tables. This is always a bit messy.
-        if not tbl.rows:
+        rows = list(tbl.rows)
+        if not rows:
             return ""
         
         # Count how many columns we need
-        col_count = len(tbl.rows[0].cells)
-        
-        bits = []
-        bits.append("\\begin{table}[h!]") # [h!] helps with positioning
-        bits.append("\\centering")
+        col_count = len(rows[0].cells)
         
         # Define columns (centered by default for neatness)
         col_def = "|" + "|".join(["c"] * col_count) + "|"
-        bits.append(f"\\begin{{tabular}}{{{col_def}}}")
-        bits.append("\\toprule") # booktabs style
-        
-        for i, row in enumerate(tbl.rows):
-            cells = []
-            for cell in row.cells:
-                # Clean up text in each cell
-                val = escape_latex(cell.text.strip())
-                cells.append(val)
-            
-            # Join with & and end with \\
-            row_str = " & ".join(cells) + " \\\\"
-            bits.append(row_str)
-            
-            # Add fancy lines for headers
-            if i == 0:
-                bits.append("\\midrule")
-            else:
-                bits.append("\\hline")
         
-        bits.append("\\bottomrule")
-        bits.append("\\end{tabular}")
+        # One line per row: cells joined with & and ended with \\
+        rows_tex = [
+            " & ".join(escape_latex(cell.text.strip()) for cell in row.cells) + " \\\\"
+            for row in rows
+        ]
         
-        # Add a placeholder caption since we can't always find it in Word
-        bits.append("\\caption{Automated Table from Word}")
-        bits.append("\\end{table}")
+        # Add fancy lines for headers, plain lines after the other rows
+        body = rows_tex[0] + "\n\\midrule" + "".join(f"\n{r}\n\\hline" for r in rows_tex[1:])
         
-        return '\n'.join(bits)
+        return '\n'.join([
+            "\\begin{table}[h!]", # [h!] helps with positioning
+            "\\centering",
+            f"\\begin{{tabular}}{{{col_def}}}",
+            "\\toprule", # booktabs style
+            body,
+            "\\bottomrule",
+            "\\end{tabular}",
+            # Add a placeholder caption since we can't always find it in Word
+            "\\caption{Automated Table from Word}",
+            "\\end{table}",
+        ])
     
     def _write_bib_file(self, tex_path: str) -> None:
         # Writes the references to a separate .bib file
@@ -285,5 +342,5 @@ class LatexGenerator:
                 for entry in self.bib_list:
                     b.write(entry + '\n\n')
             logger.info(f"Cool, created bib file at {bib_file}")
-        except:
+        except OSError:
              logger.warning("Couldnt write the bib file for some reason.")
@@ -64,6 +64,15 @@ class ConversionOptions:
     clean_temp_files: bool = True
     verbose: bool = False
     
+    # Reuse the LaTeX from last time if the same .docx is converted again
+    use_cache: bool = True
+    
+    # Batch settings (None workers means one per CPU)
+    # Turn parallel off when calling batch() from inside gevent (e.g. a gunicorn
+    # gevent worker), gevent won't let it start the worker processes there.
+    parallel: bool = True
+    max_workers: Optional[int] = None
+    
     # Whether to include full LaTeX document or just content
     include_preamble: bool = True
     standalone_document: bool = True
@@ -89,6 +98,9 @@ class ConversionOptions:
             'output_encoding': self.output_encoding,
             'clean_temp_files': self.clean_temp_files,
             'verbose': self.verbose,
+            'use_cache': self.use_cache,
+            'parallel': self.parallel,
+            'max_workers': self.max_workers,
             'include_preamble': self.include_preamble,
             'standalone_document': self.standalone_document,
         }
@@ -145,4 +157,7 @@ class ConversionOptions:
         if not self.output_encoding:
             raise ValueError("Output encoding cannot be empty")
         
+        if self.max_workers is not None and self.max_workers < 1:
+            raise ValueError("Max workers must be at least 1")
+        
         return True
@@ -49,21 +49,29 @@ LATEX_SPECIAL_CHARS = {
 }
 
 
+# Matches any of those characters, so escaping is one pass over the string
+# (str.translate looked neater but is slower here, the replacements are
+# more than one character long)
+_LATEX_ESCAPE_RE = re.compile(r'[&%$#_{}~^\\]')
+
+
 def escape_latex(text: str) -> str:
     # Escape special characters for LaTeX
-    # Otherwise LaTeX will throw errors
+    # Otherwise LaTeX will throw errors.
+    # Doing it all in one go also means the {} we add for \textbackslash{}
+    # don't get escaped again afterwards.
     if not text:
         return ""
     
-    # Handle backslash first to avoid double-escaping
-    text = text.replace('\\', r'\textbackslash{}')
-    
-    # Escape other special characters
-    for char, escaped in LATEX_SPECIAL_CHARS.items():
-        if char != '\\':  # already handled
-            text = text.replace(char, escaped)
-    
-    return text
+    return _LATEX_ESCAPE_RE.sub(lambda m: LATEX_SPECIAL_CHARS[m.group()], text)
+
+
+# For going back: every escape sequence in one regex (longest first) and
+# a reverse lookup to turn each one back into its character
+_LATEX_UNESCAPE_MAP = {escaped: char for char, escaped in LATEX_SPECIAL_CHARS.items()}
+_LATEX_UNESCAPE_RE = re.compile('|'.join(
+    re.escape(e) for e in sorted(_LATEX_UNESCAPE_MAP, key=len, reverse=True)
+))
 
 
 def unescape_latex(text: str) -> str:
@@ -71,10 +79,11 @@ def unescape_latex(text: str) -> str:
     if not text:
         return ""
     
-    for char, escaped in LATEX_SPECIAL_CHARS.items():
-        text = text.replace(escaped, char)
+    # Every escape starts with a backslash, so most plain text can skip the regex
+    if '\\' not in text:
+        return text
     
-    return text
+    return _LATEX_UNESCAPE_RE.sub(lambda m: _LATEX_UNESCAPE_MAP[m.group()], text)
 
 
 def sanitize_filename(filename: str) -> str:
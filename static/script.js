@@ -13,17 +13,18 @@ const progress = document.getElementById('progress');
 const progressBar = document.getElementById('progressBar');
 const result = document.getElementById('result');
 const resultText = document.getElementById('resultText');
+const resultList = document.getElementById('resultList');
+const downloadBtn = document.getElementById('downloadBtn');
 const error = document.getElementById('error');
 const errorText = document.getElementById('errorText');
 
-let selectedFile = null;
+let selectedFiles = [];
 
 // Trigger file input when clicking the upload area
 uploadArea.onclick = () => fileInput.click();
 
 fileInput.onchange = (e) => {
-    const file = e.target.files[0];
-    if (file) handleFile(file);
+    if (e.target.files.length) handleFiles(e.target.files);
 };
 
 // Drag and drop support
@@ -38,20 +39,23 @@ uploadArea.ondragleave = () => {
 
 uploadArea.ondrop = (e) => {
     e.preventDefault();
-    const file = e.dataTransfer.files[0];
-    if (file) handleFile(file);
+    if (e.dataTransfer.files.length) handleFiles(e.dataTransfer.files);
 };
 
-function handleFile(file) {
-    const ext = file.name.split('.').pop().toLowerCase();
-    if (!['docx', 'tex', 'latex'].includes(ext)) {
-        alert('Please select a .docx or .tex file');
-        return;
+function handleFiles(files) {
+    files = Array.from(files);
+    for (const file of files) {
+        const ext = file.name.split('.').pop().toLowerCase();
+        if (!['docx', 'tex', 'latex'].includes(ext)) {
+            alert('Please select only .docx or .tex files (' + file.name + ' is not one)');
+            return;
+        }
     }
 
-    selectedFile = file;
-    fileName.innerText = file.name;
-    fileSize.innerText = Math.round(file.size / 1024) + ' KB';
+    selectedFiles = files;
+    fileName.innerText = files.length === 1 ? files[0].name : files.length + ' files: ' + files.map(f => f.name).join(', ');
+    const totalSize = files.reduce((sum, f) => sum + f.size, 0);
+    fileSize.innerText = Math.round(totalSize / 1024) + ' KB';
 
     // Show options and hide upload box
     uploadArea.style.display = 'none';
@@ -61,7 +65,8 @@ function handleFile(file) {
 }
 
 removeFile.onclick = () => {
-    selectedFile = null;
+    selectedFiles = [];
+    fileInput.value = '';
     uploadArea.style.display = 'block';
     fileInfo.style.display = 'none';
     options.style.display = 'none';
@@ -72,7 +77,10 @@ removeFile.onclick = () => {
 
 convertBtn.onclick = async () => {
     const formData = new FormData();
-    formData.append('file', selectedFile);
+    // Everything goes up in one request, the server converts the whole batch
+    for (const file of selectedFiles) {
+        formData.append('files', file);
+    }
     formData.append('doc_type', document.getElementById('docType').value);
     formData.append('font_size', document.getElementById('fontSize').value);
     formData.append('extract_bib', document.getElementById('extractBib').checked);
@@ -84,24 +92,39 @@ convertBtn.onclick = async () => {
     convertBtn.disabled = true;
 
     try {
-        const response = await fetch('/convert', {
+        let response = await fetch('/convert', {
             method: 'POST',
+            // lets the server say no to a bad file before the upload even starts
+            // (only works for one name, with more files the server checks them after)
+            headers: selectedFiles.length === 1 ? { 'X-Filename': encodeURIComponent(selectedFiles[0].name) } : {},
             body: formData
         });
 
         // Try to get JSON from response
         const data = await response.json();
-
-        if (response.ok && data.success) {
-            progressBar.style.width = '100%';
-            result.style.display = 'block';
-            resultText.innerText = `Conversion complete! (${data.output_size})`;
-            document.getElementById('downloadBtn').onclick = () => {
-                window.location.href = data.download_url;
-            };
-        } else {
+        if (!data.files) {
             showError(data.error || 'Conversion failed');
+            return;
+        }
+
+        // 202 means the server queued them, so we wait for the workers to finish
+        let files = data.files;
+        if (response.status === 202) {
+            progressBar.style.width = '60%';
+            files = await Promise.all(files.map(async (f) => {
+                const job = await waitForJob(f.status_url);
+                return Object.assign({ filename: f.filename }, job.data);
+            }));
+        }
+
+        const done = files.filter(f => f.success);
+        if (done.length === 0) {
+            showError(files.map(f => `${f.filename}: ${f.error || 'Conversion failed'}`).join('\n'));
+            return;
         }
+
+        progressBar.style.width = '100%';
+        showResults(files, done);
     } catch (err) {
         console.error('Fetch error:', err);
         showError('Could not connect to server. Make sure web.py is running in your terminal.');
@@ -111,6 +134,49 @@ convertBtn.onclick = async () => {
     }
 };
 
+function showResults(files, done) {
+    result.style.display = 'block';
+    resultList.innerHTML = '';
+
+    if (files.length === 1) {
+        // Just one file, the big button downloads it
+        resultText.innerText = `Conversion complete! (${done[0].output_size})`;
+        downloadBtn.style.display = '';
+        downloadBtn.onclick = () => {
+            window.location.href = done[0].download_url;
+        };
+        return;
+    }
+
+    // Several files, browsers don't like starting lots of downloads at once so we list links
+    resultText.innerText = `Converted ${done.length} of ${files.length} files`;
+    downloadBtn.style.display = 'none';
+    for (const f of files) {
+        const li = document.createElement('li');
+        if (f.success) {
+            const a = document.createElement('a');
+            a.href = f.download_url;
+            a.innerText = `${f.output_filename} (${f.output_size})`;
+            li.appendChild(a);
+        } else {
+            li.innerText = `${f.filename}: ${f.error || 'Conversion failed'}`;
+        }
+        resultList.appendChild(li);
+    }
+}
+
+async function waitForJob(statusUrl) {
+    // Ask the server once a second until the job isn't 'queued'/'started' anymore
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const response = await fetch(statusUrl);
+        const data = await response.json();
+        if (response.status !== 202) {
+            return { response, data };
+        }
+    }
+}
+
 function showError(msg) {
     error.style.display = 'block';
     errorText.innerText = msg;
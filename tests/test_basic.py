@@ -1,9 +1,19 @@
 # Simple test script for doc2tex
 # Checks if the converter can load and run basic functions
 
+import io
 import os
+import time
+import shutil
+import tempfile
+import threading
 import unittest
-from doc2tex import DocTeXConverter, ConversionOptions
+from docx import Document
+from doc2tex import DocTeXConverter, ConversionOptions, FontSize
+from doc2tex import ast_cache
+from doc2tex.docx import DocxGenerator
+from doc2tex.latex import LatexGenerator
+from doc2tex.utils import escape_latex, unescape_latex, logger
 
 class TestConverter(unittest.TestCase):
     def setUp(self):
@@ -27,5 +37,258 @@ class TestConverter(unittest.TestCase):
         dir = self.converter._detect_direction("test.tex")
         self.assertEqual(dir, "to_docx")
 
+    def test_inline_formatting(self):
+        # Bold/italic/math tags should turn into separate Word runs
+        gen = DocxGenerator(self.options)
+        gen.word_doc = Document()
+        p = gen.word_doc.add_paragraph()
+        gen._apply_inline(r"a \textbf{b} c $x$ 50\%", p)
+        runs = [(r.text, bool(r.bold), bool(r.italic)) for r in p.runs]
+        self.assertEqual(runs, [
+            ("a ", False, False), ("b", True, False),
+            (" c ", False, False), ("x", False, True), (" 50%", False, False),
+        ])
+
+    def test_block_priority(self):
+        # A table in the same block as a center environment is still a table
+        gen = DocxGenerator(self.options)
+        gen.word_doc = Document()
+        gen._parse_and_build(
+            "text \\begin{center} x \\end{center} \\begin{table}\n"
+            "\\begin{tabular}{|c|c|}\na & b \\\\\n\\end{tabular}\n\\end{table}"
+        )
+        self.assertEqual(len(gen.word_doc.tables), 1)
+
+    def test_read_body(self):
+        # Only the document body comes back, with Windows line endings turned into \n
+        gen = DocxGenerator(self.options)
+        cases = [
+            (b"\\documentclass{article}\r\n\\begin{document}\r\nHello\r\n\r\nWorld\r\n\\end{document}\r\n",
+             "Hello\n\nWorld"),
+            (b"", ""),
+            # No \end{document}: we take the whole file
+            (b"\\begin{document}\nunfinished\n", "\\begin{document}\nunfinished"),
+            ("\\begin{document}\nÜber café – naïve\n\\end{document}".encode('utf-8'), "Über café – naïve"),
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'in.tex')
+            for raw, expected in cases:
+                with open(path, 'wb') as f:
+                    f.write(raw)
+                self.assertEqual(gen._read_body(path), expected)
+
+    def test_add_list(self):
+        # Empty items are skipped, the last item still counts without an \end after it
+        gen = DocxGenerator(self.options)
+        gen.word_doc = Document()
+        gen._add_list("\\begin{itemize}\n\\item first\n\\item   \n\\item \\textbf{last}")
+        paras = gen.word_doc.paragraphs
+        self.assertEqual([p.text for p in paras], ['first', 'last'])
+        self.assertEqual(paras[0].style.name, 'List Bullet')
+
+    def test_escape_latex(self):
+        # Special characters get escaped exactly once
+        self.assertEqual(escape_latex("50% & $5_a"), r"50\% \& \$5\_a")
+        self.assertEqual(escape_latex("a\\b{c}"), r"a\textbackslash{}b\{c\}")
+        
+        # And unescaping gives back the original text
+        text = "a&b%c$d#e_f{g}h~i^j\\k"
+        self.assertEqual(unescape_latex(escape_latex(text)), text)
+
+    def test_cache_reuses_output(self):
+        # Converting the same docx twice should give back the cached LaTeX
+        with tempfile.TemporaryDirectory() as tmp:
+            old_dir = ast_cache.CACHE_DIR
+            ast_cache.CACHE_DIR = os.path.join(tmp, 'cache')
+            try:
+                src = os.path.join(tmp, 'report.docx')
+                doc = Document()
+                doc.add_paragraph('Hello cache')
+                doc.save(src)
+                
+                with open(self.converter.convert(src, os.path.join(tmp, 'a.tex'))) as f:
+                    first = f.read()
+                with open(src, 'rb') as f:
+                    key = ast_cache.make_key(f.read(), self.options)
+                with open(ast_cache.load(key)) as f:
+                    self.assertEqual(f.read(), first)
+                
+                with open(self.converter.convert(src, os.path.join(tmp, 'b.tex'))) as f:
+                    second = f.read()
+                self.assertEqual(first, second)
+            finally:
+                ast_cache.CACHE_DIR = old_dir
+
+    def test_warmup_builds_preamble(self):
+        # After warmup the preamble for these settings should already be cached
+        LatexGenerator._PREAMBLE_CACHE.clear()
+        self.converter.warmup()
+        self.assertEqual(len(LatexGenerator._PREAMBLE_CACHE), 1)
+
+    def test_cache_drops_expired(self):
+        # Entries past the TTL are deleted, and the folder is private to the user
+        with tempfile.TemporaryDirectory() as tmp:
+            old_dir = ast_cache.CACHE_DIR
+            ast_cache.CACHE_DIR = os.path.join(tmp, 'cache')
+            try:
+                src = os.path.join(tmp, 'a.tex')
+                with open(src, 'w') as f:
+                    f.write('cached')
+                ast_cache.store('abc', src)
+                if os.name == 'posix':
+                    self.assertEqual(os.stat(ast_cache.CACHE_DIR).st_mode & 0o777, 0o700)
+                
+                path = ast_cache.load('abc')
+                self.assertIsNotNone(path)
+                old = time.time() - ast_cache.CACHE_TTL - 10
+                os.utime(path, (old, old))
+                self.assertIsNone(ast_cache.load('abc'))
+                self.assertFalse(os.path.exists(path))
+            finally:
+                ast_cache.CACHE_DIR = old_dir
+
+    def test_cache_key_ignores_runtime_options(self):
+        # Only settings that change the output should change the key
+        key = ast_cache.make_key(b'doc', ConversionOptions())
+        self.assertEqual(key, ast_cache.make_key(b'doc', ConversionOptions(verbose=True, parallel=False)))
+        self.assertNotEqual(key, ast_cache.make_key(b'doc', ConversionOptions(font_size=FontSize.PT_10)))
+
+    def test_batch_keeps_order(self):
+        # Bad inputs give None in their slot, the rest stay in order,
+        # with and without the process pool
+        with tempfile.TemporaryDirectory() as tmp:
+            files = []
+            for name in ('one', 'two'):
+                path = os.path.join(tmp, name + '.docx')
+                doc = Document()
+                doc.add_paragraph(name)
+                doc.save(path)
+                files.append(path)
+            files.insert(1, os.path.join(tmp, 'scan.pdf'))
+            files.append(os.path.join(tmp, 'missing.docx'))
+            
+            for parallel in (True, False):
+                out = os.path.join(tmp, f'out-{parallel}')
+                conv = DocTeXConverter(ConversionOptions(parallel=parallel, max_workers=2, use_cache=False))
+                results = conv.batch(files, out)
+                self.assertEqual(results, [
+                    os.path.join(out, 'one.tex'), None, os.path.join(out, 'two.tex'), None
+                ])
+                for r in (results[0], results[2]):
+                    self.assertTrue(os.path.exists(r))
+
+def make_docx(text: str) -> bytes:
+    # A tiny Word file with one paragraph, as bytes
+    doc = Document()
+    doc.add_paragraph(text)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+class TestWeb(unittest.TestCase):
+    # Goes through the Flask test client, with uploads in a temp folder
+    @classmethod
+    def setUpClass(cls):
+        cls.upload_dir = tempfile.mkdtemp()
+        os.environ['DOC2TEX_UPLOAD_FOLDER'] = cls.upload_dir
+        import web
+        # (in case something imported web before us)
+        web.app.config['UPLOAD_FOLDER'] = cls.upload_dir
+        web.app.config['RESULT_CACHE_FOLDER'] = os.path.join(cls.upload_dir, 'cache')
+        os.makedirs(web.app.config['RESULT_CACHE_FOLDER'], exist_ok=True)
+        web.conversion_queue = None
+        cls.web = web
+    
+    @classmethod
+    def tearDownClass(cls):
+        os.environ.pop('DOC2TEX_UPLOAD_FOLDER', None)
+        shutil.rmtree(cls.upload_dir, ignore_errors=True)
+    
+    def setUp(self):
+        self.client = self.web.app.test_client()
+    
+    def upload(self, files, field='file', **form):
+        # files is a list of (name, bytes)
+        data = dict(form)
+        data[field] = [(io.BytesIO(b), name) for name, b in files]
+        return self.client.post('/convert', data=data, content_type='multipart/form-data')
+    
+    def test_convert_and_cache_hit(self):
+        doc = make_docx('Cache me')
+        first = self.upload([('notes.docx', doc)]).get_json()
+        self.assertTrue(first['success'])
+        self.assertEqual(first['output_filename'], 'notes.tex')
+        self.assertIn(b'Cache me', self.client.get(first['download_url']).data)
+        
+        # Same bytes and settings again: served from the result cache
+        with self.assertLogs(logger, 'INFO') as logs:
+            second = self.upload([('notes.docx', doc)]).get_json()
+        self.assertTrue(any('cache hit' in line for line in logs.output))
+        self.assertIn(b'Cache me', self.client.get(second['download_url']).data)
+    
+    def test_batch_reply(self):
+        tex = b"\\begin{document}\nHello\n\\end{document}"
+        r = self.upload([('a.docx', make_docx('one')), ('a.docx', make_docx('two')), ('b.tex', tex)],
+                        field='files')
+        data = r.get_json()
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(data['success'])
+        self.assertEqual([f['filename'] for f in data['files']], ['a.docx', 'a_2.docx', 'b.tex'])
+        self.assertEqual([f['output_filename'] for f in data['files']], ['a.tex', 'a_2.tex', 'b.docx'])
+        self.assertIn(b'two', self.client.get(data['files'][1]['download_url']).data)
+    
+    def test_preflight_rejects(self):
+        # Wrong type from the X-Filename header, or too big from Content-Length
+        r = self.client.post('/convert', data={'file': (io.BytesIO(b'x'), 'a.docx')},
+                             content_type='multipart/form-data', headers={'X-Filename': 'evil.exe'})
+        self.assertEqual(r.status_code, 415)
+        
+        too_big = self.web.app.config['MAX_CONTENT_LENGTH'] + 1
+        r = self.client.post('/convert/raw?filename=a.docx', data=b'x',
+                             environ_overrides={'CONTENT_LENGTH': str(too_big)})
+        self.assertEqual(r.status_code, 413)
+    
+    def test_malformed_multipart(self):
+        r = self.client.post('/convert', data=b'this is not multipart',
+                             content_type='multipart/form-data; boundary=xyz')
+        self.assertEqual(r.status_code, 400)
+        self.assertFalse(r.get_json()['success'])
+    
+    def test_download_etag(self):
+        url = self.upload([('etag.docx', make_docx('etag'))]).get_json()['download_url']
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        self.assertIn('immutable', r.headers['Cache-Control'])
+        
+        r = self.client.get(url, headers={'If-None-Match': r.headers['ETag']})
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r.data, b'')
+        
+        # A wildcard isn't proof the browser has this result
+        r = self.client.get('/download/nofid/x.tex?v=deadbeef', headers={'If-None-Match': '*'})
+        self.assertEqual(r.status_code, 404)
+    
+    def test_same_name_concurrent(self):
+        # Two people uploading different files called report.docx at the same time
+        # must each get their own document back
+        wrong = []
+        
+        def user(word):
+            client = self.web.app.test_client()
+            doc = make_docx(word)
+            for _ in range(10):
+                data = client.post('/convert', data={'file': (io.BytesIO(doc), 'report.docx')},
+                                        content_type='multipart/form-data').get_json()
+                body = client.get(data['download_url']).data if data.get('success') else b''
+                if word.encode() not in body:
+                    wrong.append(word)
+        
+        threads = [threading.Thread(target=user, args=(w,)) for w in ('ALPHA', 'BRAVO')]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(wrong, [])
+
 if __name__ == '__main__':
     unittest.main()
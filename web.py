@@ -3,10 +3,23 @@
 # I built this so my lab mates don't have to use the terminal to convert their reports.
 
 import os
+import time
+import uuid
+import atexit
+import threading
+import shutil
+import mimetypes
+import hashlib
+import functools
 import tempfile
 from pathlib import Path
-from flask import Flask, render_template, request, send_file, jsonify, url_for
+from flask import Flask, Response, render_template, request, send_file, jsonify, url_for
 from werkzeug.utils import secure_filename
+from urllib.parse import unquote
+from streaming_form_data import StreamingFormDataParser, ParseFailedException
+from streaming_form_data.targets import BaseTarget, ValueTarget
+from gevent import monkey, get_hub
+from gevent.socket import socket as GeventSocket, wait_write
 
 # Pull in my core logic
 from doc2tex import (
@@ -18,89 +31,589 @@ from doc2tex import (
     ConversionError
 )
 from doc2tex.utils import logger, setup_logger, get_file_info
+from redis import Redis
+from rq import Queue
+from rq.job import JobStatus
 
 # Initializing the Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'lab-project-secret-2026' # Just for local use
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024 # 16MB should be enough for any Word doc
-app.config['UPLOAD_FOLDER'] = os.path.join(tempfile.gettempdir(), 'doc2tex_web_uploads')
+
+def pick_upload_folder() -> str:
+    # Uploads and results are short-lived, so keep them in RAM when we can.
+    # /dev/shm is a tmpfs on Linux, everywhere else we fall back to the temp dir.
+    # It can be tiny though (Docker gives you 64MB), so only use it if every
+    # worker can have a full-size upload in there at once.
+    if os.environ.get('DOC2TEX_UPLOAD_FOLDER'):
+        return os.environ['DOC2TEX_UPLOAD_FOLDER']
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        needed = app.config['MAX_CONTENT_LENGTH'] * (os.cpu_count() or 1)
+        if shutil.disk_usage('/dev/shm').total >= needed:
+            return '/dev/shm/doc2tex_web'
+    return os.path.join(tempfile.gettempdir(), 'doc2tex_web_uploads')
+
+app.config['UPLOAD_FOLDER'] = pick_upload_folder()
+
+# Finished conversions, named by a hash of the input file + settings, so the same
+# report uploaded again doesn't get converted again
+app.config['RESULT_CACHE_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'cache')
+
+# When running behind nginx, set DOC2TEX_ACCEL_PREFIX to an 'internal' location that
+# points at the upload folder (see README). Downloads are then handed off to nginx,
+# which sends the file itself instead of pushing the bytes through Python.
+# USE_X_SENDFILE does the same for Apache/lighttpd (Flask supports that one already).
+app.config['X_ACCEL_PREFIX'] = os.environ.get('DOC2TEX_ACCEL_PREFIX')
+app.config['USE_X_SENDFILE'] = bool(os.environ.get('DOC2TEX_X_SENDFILE'))
 
 # Make sure the upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+os.makedirs(app.config['RESULT_CACHE_FOLDER'], exist_ok=True)
+
+# Oldest used entries go first once the cache is over this. At most 256MB, and
+# never more than a quarter of the filesystem it's on (it may be a small tmpfs),
+# so there's always room left for uploads.
+app.config['RESULT_CACHE_MAX_BYTES'] = min(
+    256 * 1024 * 1024, shutil.disk_usage(app.config['RESULT_CACHE_FOLDER']).total // 4
+)
+
+# Leftover uploads/results get deleted after an hour, checked every 10 minutes.
+# (downloads normally clean up after themselves, this catches everything else)
+STALE_FILE_AGE = 60 * 60
+CLEANUP_INTERVAL = 10 * 60
+
+def sweep_upload_folder() -> None:
+    # Deletes old files from the upload folder. The result cache is a folder,
+    # so it's skipped here (it has its own size limit).
+    cutoff = time.time() - STALE_FILE_AGE
+    for entry in os.scandir(app.config['UPLOAD_FOLDER']):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass # somebody else got to it first
+
+def start_cleanup_thread() -> None:
+    # A plain daemon thread is all we need for this, no scheduler library
+    stop = threading.Event()
+    
+    def loop():
+        while not stop.wait(CLEANUP_INTERVAL):
+            try:
+                sweep_upload_folder()
+            except OSError as e:
+                logger.warning("Upload cleanup failed: %s", e)
+    
+    threading.Thread(target=loop, name='doc2tex-cleanup', daemon=True).start()
+    atexit.register(stop.set)
+
+start_cleanup_thread()
+
+# Optional background job queue. Set REDIS_URL and run 'rq worker doc2tex' from this
+# folder, and conversions happen in the worker instead of holding up the request.
+# Without it we just convert right inside the request like before.
+conversion_queue = None
+if os.environ.get('REDIS_URL'):
+    conversion_queue = Queue('doc2tex', connection=Redis.from_url(os.environ['REDIS_URL']))
+
+# The form fields we read next to the file (matching the ones in script.js)
+FORM_FIELDS = ['doc_type', 'font_size', 'line_spacing', 'extract_bib', 'unicode_support']
+
+# Form value -> enum member, built once. Anything we don't know falls back to the default.
+DOC_TYPES = {m.value: m for m in DocumentType}
+FONT_SIZES = {m.value: m for m in FontSize}
+LINE_SPACINGS = {m.value: m for m in LineSpacing}
+
+# How much of the upload we read at a time (1MB keeps the per-chunk overhead tiny)
+CHUNK_SIZE = 1024 * 1024
+
+def use_kernel_sendfile() -> None:
+    # gunicorn hands the open file from send_file to sock.sendfile(), but gevent's
+    # socket does that with plain send() calls, so every byte of a download still
+    # gets read into Python. This swaps in os.sendfile (the kernel copies straight
+    # from the page cache to the socket) and waits on the event loop when the
+    # socket is full, so other requests keep running.
+    if not (monkey.is_module_patched('socket') and hasattr(os, 'sendfile')):
+        return
+    send_with_send = GeventSocket.sendfile
+    
+    def sendfile(sock, file, offset=0, count=None):
+        sent = 0
+        while count is None or sent < count:
+            size = CHUNK_SIZE if count is None else min(CHUNK_SIZE, count - sent)
+            try:
+                n = os.sendfile(sock.fileno(), file.fileno(), offset + sent, size)
+            except BlockingIOError:
+                wait_write(sock.fileno(), timeout=sock.gettimeout())
+                continue
+            except OSError:
+                # Not something the kernel can sendfile (not a regular file etc.)
+                if sent == 0:
+                    return send_with_send(sock, file, offset, count)
+                raise
+            if n == 0:
+                break
+            sent += n
+        file.seek(offset + sent)
+        return sent
+    
+    GeventSocket.sendfile = sendfile
+
+use_kernel_sendfile()
+
+# We only take Word and LaTeX files
+ALLOWED_EXTS = frozenset(('docx', 'tex', 'latex'))
 
 def is_allowed(filename: str) -> bool:
-    # We only take Word and LaTeX files
-    ext = Path(filename).suffix.lower().lstrip('.')
-    return ext in ['docx', 'tex', 'latex']
+    # Runs on every upload, so just a plain string search (no Path object)
+    i = filename.rfind('.')
+    return i != -1 and filename[i + 1:].lower() in ALLOWED_EXTS
+
+class UploadTarget(BaseTarget):
+    # Writes every file sent in one form field to its own temp file in the upload
+    # folder, hashing it on the way so the result cache doesn't have to read it again.
+    # After parsing, .files holds (original filename, temp path, SHA-256) for each one.
+    def __init__(self, folder: str):
+        super().__init__()
+        self.folder = folder
+        self.files = []
+        self._fh = None
+    
+    def on_start(self):
+        self._path = os.path.join(self.folder, f"upload-{uuid.uuid4().hex}.part")
+        self._sha256 = hashlib.sha256()
+        self._fh = open(self._path, 'wb')
+    
+    def on_data_received(self, chunk: bytes):
+        self._sha256.update(chunk)
+        self._fh.write(chunk)
+    
+    def on_finish(self):
+        self._fh.close()
+        self._fh = None
+        self.files.append((self.multipart_filename, self._path, self._sha256.hexdigest()))
+    
+    def remove_all(self):
+        # Deletes everything we wrote, including a file that was cut off halfway
+        if self._fh is not None:
+            self._fh.close()
+            remove_quietly(self._path)
+        for _, path, _ in self.files:
+            remove_quietly(path)
+
+def save_stream(stream, path: str) -> str:
+    # Copies a raw request body to disk in big chunks, hashing it on the way.
+    # Returns the SHA-256 of the file.
+    h = hashlib.sha256()
+    with open(path, 'wb') as fh:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            h.update(chunk)
+            fh.write(chunk)
+    return h.hexdigest()
 
 @app.route('/')
 def home():
     # The main (and only) page
     return render_template('index.html')
 
+@app.before_request
+def check_upload_headers():
+    # Turn away uploads we'd reject anyway before reading any of the body.
+    # script.js sends the filename in an X-Filename header for this
+    # (the real check on the multipart filename still happens in handle_convert).
+    if request.method != 'POST' or request.endpoint not in ('handle_convert', 'handle_convert_raw'):
+        return None
+    
+    size = request.headers.get('Content-Length', type=int)
+    if size is not None and size > app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'success': False, 'error': 'File is too big (16MB max)'}), 413
+    
+    header_name = request.headers.get('X-Filename')
+    if header_name and not is_allowed(unquote(header_name)):
+        return jsonify({'success': False, 'error': 'Invalid file type. Use .docx or .tex'}), 415
+    return None
+
+def receive_upload():
+    # Parses the multipart body ourselves instead of going through request.files.
+    # Werkzeug's parser is slow on big uploads, this one is written in C and writes
+    # the files straight to disk while it reads.
+    # The page sends its files as 'files' (can be several), 'file' is the old single upload.
+    # Returns (the 'file' upload, the 'files' uploads, form values)
+    single = UploadTarget(app.config['UPLOAD_FOLDER'])
+    multiple = UploadTarget(app.config['UPLOAD_FOLDER'])
+    
+    try:
+        parser = StreamingFormDataParser(headers=request.headers)
+        parser.register('file', single)
+        parser.register('files', multiple)
+        fields = {}
+        for name in FORM_FIELDS:
+            fields[name] = ValueTarget()
+            parser.register(name, fields[name])
+        
+        while True:
+            chunk = request.stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.data_received(chunk)
+    except Exception:
+        # Don't leave half an upload lying around
+        single.remove_all()
+        multiple.remove_all()
+        raise
+    
+    form = {name: t.value.decode('utf-8') for name, t in fields.items() if t.value}
+    return single.files, multiple.files, form
+
 @app.route('/convert', methods=['POST'])
 def handle_convert():
     # This matches the 'Convert' button click in the browser
     try:
+        # Save a local copy of the uploaded files (under temporary names for now)
+        try:
+            single, multiple, form = receive_upload()
+        except ParseFailedException as e:
+            return jsonify({'success': False, 'error': f'Could not read the upload: {e}'}), 400
+        
+        # An empty file input still sends a part, just without a filename
+        uploads = []
+        for orig_name, tmp_path, file_hash in single + multiple:
+            if orig_name:
+                uploads.append((orig_name, tmp_path, file_hash))
+            else:
+                remove_quietly(tmp_path)
+        
         # Check if a file was actually uploaded
-        if 'file' not in request.files:
+        if not uploads:
             return jsonify({'success': False, 'error': 'No file uploaded!'}), 400
-            
-        file = request.files['file']
-        if file.filename == '' or not is_allowed(file.filename):
+        
+        if not all(is_allowed(orig_name) for orig_name, _, _ in uploads):
+            for _, tmp_path, _ in uploads:
+                remove_quietly(tmp_path)
             return jsonify({'success': False, 'error': 'Invalid file type. Use .docx or .tex'}), 400
-            
-        # Save a local copy of the uploaded file
-        fname = secure_filename(file.filename)
-        in_path = os.path.join(app.config['UPLOAD_FOLDER'], fname)
-        file.save(in_path)
         
-        # Grab the settings from the form (matching values in options.py)
-        user_settings = ConversionOptions(
-            document_type=DocumentType(request.form.get('doc_type', 'article')),
-            font_size=FontSize(request.form.get('font_size', '12pt')),
-            line_spacing=LineSpacing(request.form.get('line_spacing', 'single')),
-            extract_bibliography=request.form.get('extract_bib') == 'true',
-            unicode_support=request.form.get('unicode_support', 'true') == 'true'
-        )
+        saved = []
+        taken = set()
+        for orig_name, tmp_path, file_hash in uploads:
+            fname = clean_name(orig_name)
+            # Same name twice in one batch, number them so the downloads can be told apart
+            stem, ext = os.path.splitext(fname)
+            n = 1
+            while fname in taken:
+                n += 1
+                fname = f"{stem}_{n}{ext}"
+            taken.add(fname)
+            file_id = uuid.uuid4().hex
+            os.replace(tmp_path, upload_path(file_id, ext))
+            saved.append((fname, file_id, file_hash))
         
-        # Create our converter instance
-        c = DocTeXConverter(user_settings)
+        if not multiple:
+            fname, file_id, file_hash = saved[0]
+            return convert_and_reply(fname, file_id, form, file_hash)
+        return convert_batch_and_reply(saved, form)
         
-        # Determine output name automatically
-        in_ext = Path(fname).suffix.lower()
-        out_ext = '.tex' if in_ext == '.docx' else '.docx'
-        out_name = Path(fname).stem + out_ext
-        out_path = os.path.join(app.config['UPLOAD_FOLDER'], out_name)
+    except Exception as e:
+        logger.error("Web UI Error: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/convert/raw', methods=['POST'])
+def handle_convert_raw():
+    # Same as /convert, but the body is just the file bytes (application/octet-stream)
+    # and the filename + settings come in the query string, e.g.
+    #   POST /convert/raw?filename=report.docx&doc_type=report
+    # No multipart parsing at all, we just copy the body onto the disk.
+    try:
+        orig_name = request.args.get('filename', '')
+        if not orig_name or not is_allowed(orig_name):
+            return jsonify({'success': False, 'error': 'Invalid file type. Use .docx or .tex'}), 400
         
-        # Run the conversion
-        logger.info(f"Web conversion started: {fname}")
-        res_path = c.convert(in_path, out_path)
-        stats = get_file_info(res_path)
+        # Stream it to a name nobody else uses first, like UploadTarget does, so an
+        # upload with the same filename can't write over it halfway through
+        tmp_path = os.path.join(app.config['UPLOAD_FOLDER'], f"upload-{uuid.uuid4().hex}.part")
+        try:
+            file_hash = save_stream(request.stream, tmp_path)
+        except Exception:
+            remove_quietly(tmp_path)
+            raise
         
-        # Tell the browser where to download the result
-        return jsonify({
-            'success': True,
-            'output_filename': out_name,
-            'output_size': stats['size_formatted'],
-            'download_url': url_for('get_result', name=out_name)
-        })
+        fname = clean_name(orig_name)
+        file_id = uuid.uuid4().hex
+        os.replace(tmp_path, upload_path(file_id, os.path.splitext(fname)[1]))
+        
+        return convert_and_reply(fname, file_id, request.args, file_hash)
         
     except Exception as e:
-        logger.error(f"Web UI Error: {e}")
+        logger.error("Web UI Error: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/download/<name>')
-def get_result(name):
-    # Sends the file back to the browser
-    # Using secure_filename again just to be safe
-    safe_name = secure_filename(name)
-    target = os.path.join(app.config['UPLOAD_FOLDER'], safe_name)
+def clean_name(orig_name: str) -> str:
+    # The name we show and offer the download under. Only used for that, the files
+    # on disk are named by a random id (see upload_path), so two people uploading
+    # 'report.docx' at once never touch each other's files.
+    stem, ext = os.path.splitext(orig_name)
+    return (secure_filename(stem) or 'document') + ext.lower()
+
+def upload_path(file_id: str, ext: str) -> str:
+    return os.path.join(app.config['UPLOAD_FOLDER'], f"upload-{file_id}{ext}")
+
+def result_path(file_id: str, ext: str) -> str:
+    return os.path.join(app.config['UPLOAD_FOLDER'], f"result-{file_id}{ext}")
+
+def convert_and_reply(fname: str, file_id: str, form, file_hash: str):
+    # Converts a saved upload and builds the JSON reply for the browser.
+    # With a job queue the conversion happens in an rq worker and the browser
+    # gets a job id to poll instead.
+    form = dict(form.items())
+    if conversion_queue is not None:
+        job = conversion_queue.enqueue(run_conversion, fname, file_id, form, file_hash)
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status_url': url_for('job_status', jid=job.id)
+        }), 202
+    
+    result = run_in_thread(run_conversion, fname, file_id, form, file_hash)
+    return jsonify(result_reply(result))
+
+def convert_batch_and_reply(saved: list, form):
+    # Same as convert_and_reply for several files at once, the reply has one entry
+    # per file in 'files'. With a job queue every file gets its own job, so the
+    # workers convert them in parallel.
+    form = dict(form.items())
+    replies = []
+    if conversion_queue is not None:
+        for fname, file_id, file_hash in saved:
+            job = conversion_queue.enqueue(run_conversion, fname, file_id, form, file_hash)
+            replies.append({
+                'success': True,
+                'filename': fname,
+                'job_id': job.id,
+                'status_url': url_for('job_status', jid=job.id)
+            })
+        return jsonify({'success': True, 'files': replies}), 202
     
-    if os.path.exists(target):
-         return send_file(target, as_attachment=True)
+    # No workers, so one after the other. (A process pool can't be started
+    # from inside a gevent worker, gevent doesn't allow it off the main loop)
+    for fname, file_id, file_hash in saved:
+        try:
+            result = run_in_thread(run_conversion, fname, file_id, form, file_hash)
+            replies.append(dict(result_reply(result), filename=fname))
+        except Exception as e:
+            # One broken file shouldn't cost the user the rest of the batch
+            logger.error("Web UI Error: %s", e)
+            replies.append({'success': False, 'filename': fname, 'error': str(e)})
+    return jsonify({'success': all(r['success'] for r in replies), 'files': replies})
+
+def run_in_thread(func, *args):
+    # Under gunicorn's gevent workers, a long conversion would freeze every other
+    # request handled by the same worker (greenlets only switch on I/O).
+    # gevent's threadpool runs it on a real thread, so this request just waits
+    # while the worker keeps serving uploads and downloads.
+    if monkey.is_module_patched('threading'):
+        return get_hub().threadpool.apply(func, args)
+    return func(*args)
+
+def result_reply(result: dict) -> dict:
+    # Tell the browser where to download the result
+    return {
+        'success': True,
+        'output_filename': result['output_filename'],
+        'output_size': result['output_size'],
+        # The cache key in the link means the same URL always gets the same bytes,
+        # so browsers are allowed to keep it (see get_result)
+        'download_url': url_for('get_result', fid=result['file_id'], name=result['output_filename'],
+                                v=result['result_key'])
+    }
+
+@functools.lru_cache(maxsize=32)
+def get_converter(doc_type, font_size, line_spacing, extract_bib, unicode_support) -> DocTeXConverter:
+    # One converter per combination of settings, shared by every request using them.
+    # That's safe: convert() keeps nothing on the instance, each call makes its own generator.
+    return DocTeXConverter(ConversionOptions(
+        document_type=doc_type,
+        font_size=font_size,
+        line_spacing=line_spacing,
+        extract_bibliography=extract_bib,
+        unicode_support=unicode_support,
+        # We have our own result cache (in RAM), no need to write everything to disk again
+        use_cache=False
+    ))
+
+# Get the default settings' converter ready now, instead of on the first upload.
+# (Flask's before_first_request would have been the place for this, but it's gone since 2.3)
+get_converter(DocumentType.ARTICLE, FontSize.PT_12, LineSpacing.SINGLE, False, True).warmup()
+
+def run_conversion(fname: str, file_id: str, form: dict, file_hash: str) -> dict:
+    # Does the actual conversion of a saved upload. This runs either inside the
+    # request or in an rq worker, so it only returns plain data.
+    # Grab the settings from the form (matching values in options.py)
+    c = get_converter(
+        DOC_TYPES.get(form.get('doc_type'), DocumentType.ARTICLE),
+        FONT_SIZES.get(form.get('font_size'), FontSize.PT_12),
+        LINE_SPACINGS.get(form.get('line_spacing'), LineSpacing.SINGLE),
+        form.get('extract_bib') == 'true',
+        form.get('unicode_support', 'true') == 'true'
+    )
+    user_settings = c.settings
+    
+    # Determine output name automatically
+    in_ext = Path(fname).suffix.lower()
+    out_ext = '.tex' if in_ext == '.docx' else '.docx'
+    out_name = Path(fname).stem + out_ext
+    in_path = upload_path(file_id, in_ext)
+    out_path = result_path(file_id, out_ext)
+    
+    # Same file with the same settings as before? Then we already have the result.
+    # (file_hash was taken while saving this upload, so it matches what we convert)
+    # (v2: entries from before uploads got their own ids may hold someone else's file)
+    key = hashlib.sha256(f"v2:{file_hash}:{user_settings.to_dict()!r}".encode()).hexdigest()
+    cached = os.path.join(app.config['RESULT_CACHE_FOLDER'], key + out_ext)
+    if os.path.exists(cached):
+        logger.info("Web conversion cache hit: %s", fname)
+        os.utime(cached) # mark it as recently used
+        materialize(cached, out_path)
+        remove_quietly(in_path)
+        res_path = out_path
     else:
+        logger.info("Web conversion started: %s", fname)
+        try:
+            res_path = c.convert(in_path, out_path)
+        finally:
+            # We only needed the upload for this, the result is what gets downloaded
+            remove_quietly(in_path)
+        store_result(res_path, cached)
+    
+    stats = get_file_info(res_path)
+    return {
+        'output_filename': out_name,
+        'output_size': stats['size_formatted'],
+        'result_key': key,
+        'file_id': file_id
+    }
+
+@app.route('/status/<jid>')
+def job_status(jid):
+    # The browser polls this after /convert handed it a job id
+    job = conversion_queue.fetch_job(jid) if conversion_queue is not None else None
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    
+    status = job.get_status()
+    if status == JobStatus.FINISHED:
+        return jsonify(result_reply(job.return_value()))
+    if status in (JobStatus.FAILED, JobStatus.STOPPED, JobStatus.CANCELED):
+        # The last line of the traceback is 'SomeError: message', we just want the message
+        exc = (job.latest_result().exc_string if job.latest_result() else '') or 'Conversion failed'
+        msg = exc.strip().splitlines()[-1].split(': ', 1)[-1]
+        return jsonify({'success': False, 'error': msg}), 500
+    
+    # Still waiting or running
+    return jsonify({'success': True, 'status': status.value}), 202
+
+def store_result(path: str, cached: str) -> None:
+    # Keeps a copy of a finished conversion in the result cache
+    try:
+        tmp = f"{cached}.{uuid.uuid4().hex}.tmp"
+        materialize(path, tmp)
+        os.replace(tmp, cached)
+        trim_result_cache()
+    except OSError as e:
+        logger.warning("Couldn't cache the result: %s", e)
+
+def materialize(src: str, dst: str) -> None:
+    # Puts a copy of src at dst. The cache lives inside the upload folder, so a
+    # hardlink works almost always and costs nothing, copying is just the fallback.
+    # (nothing writes to a result after it's made, so sharing the file is fine)
+    remove_quietly(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+def trim_result_cache() -> None:
+    # Deletes the least recently used results until the cache fits the size cap
+    entries = []
+    total = 0
+    for entry in os.scandir(app.config['RESULT_CACHE_FOLDER']):
+        if entry.is_file():
+            st = entry.stat()
+            entries.append((st.st_atime, st.st_size, entry.path))
+            total += st.st_size
+    
+    entries.sort()
+    for _, size, path in entries:
+        if total <= app.config['RESULT_CACHE_MAX_BYTES']:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+@app.route('/download/<fid>/<name>')
+def get_result(fid, name):
+    # Sends the file back to the browser. fid picks the file, name is only what the
+    # browser saves it as. Using secure_filename again just to be safe
+    safe_name = secure_filename(name)
+    target = result_path(secure_filename(fid), os.path.splitext(safe_name)[1])
+    
+    # ?v= is the result cache key. The browser already has that exact file, nothing to send.
+    version = secure_filename(request.args.get('v', ''))
+    if version and version in request.if_none_match.as_set():
+        resp = Response(status=304)
+        resp.set_etag(version)
+        return resp
+    
+    # Prefer the cached copy, it's named by the key in the link so it's always those bytes
+    source = target
+    if version:
+        cached = os.path.join(app.config['RESULT_CACHE_FOLDER'], version + os.path.splitext(safe_name)[1])
+        if os.path.exists(cached):
+            source = cached
+    
+    if not os.path.exists(source):
          return "Error: File disappeared! Try converting it again.", 404
+    
+    accel_prefix = app.config['X_ACCEL_PREFIX']
+    if accel_prefix:
+         # Empty response, nginx sees the header and serves the file from disk
+         rel_path = os.path.relpath(source, app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+         resp = Response(mimetype=mimetypes.guess_type(safe_name)[0] or 'application/octet-stream')
+         resp.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + rel_path
+         resp.headers['Content-Disposition'] = f'attachment; filename="{safe_name}"'
+    else:
+         # When we're sending the cached copy, the one in the upload folder isn't needed
+         # anymore (the link keeps working off the cache). Deleting it right after opening
+         # is fine, the open file keeps the bytes around until send_file is done.
+         # (call_on_close would be nicer, but it never fires for send_file responses
+         # since they skip the wrapper that calls it)
+         # If it's the only copy we leave it, so a second click still works, and the
+         # cleanup thread gets it after an hour.
+         fh = open(source, 'rb')
+         if request.method == 'GET' and source != target:
+             remove_quietly(target)
+         # send_file answers If-None-Match with a 304 by itself
+         resp = send_file(fh, as_attachment=True, download_name=safe_name, etag=version or False)
+         # it can't know the size of an open file by itself
+         if resp.status_code == 200:
+             resp.content_length = os.fstat(fh.fileno()).st_size
+    
+    if version and source != target:
+        # Content-addressed, it can never change, so browsers never need to ask again
+        resp.cache_control.no_cache = None
+        resp.cache_control.public = True
+        resp.cache_control.max_age = 365 * 24 * 3600
+        resp.cache_control.immutable = True
+    return resp
+
+def remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
 
 def start_server():
     # Entry point if you run 'python web.py' directly
@@ -109,7 +622,38 @@ def start_server():
     print("doc2tex server is warming up...")
     print("Open this link: http://localhost:5000")
     print("-------------------------------------------------")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    
+    if os.environ.get('FLASK_DEV'):
+        # Flask's own server handles one request at a time, only use it for hacking on the code
+        app.run(host='0.0.0.0', port=5000, debug=True)
+        return
+    
+    # gunicorn with gevent workers, so one slow conversion doesn't block everyone else.
+    # (the gevent worker does the monkey patching itself before loading the app)
+    if conversion_queue is not None:
+        # The rq workers do the converting, so this process only moves uploads and
+        # downloads around. That's all waiting on sockets, which gevent is good at:
+        # a couple of workers with lots of connections each is plenty.
+        workers, connections = 2, 500
+    else:
+        # Conversions run in here too, so one worker per core
+        workers, connections = os.cpu_count() or 1, 200
+    gunicorn_args = [
+        'gunicorn',
+        '-k', 'gevent',
+        '-w', str(workers),
+        '--worker-connections', str(connections),
+        '--timeout', '120',
+        '--bind', '0.0.0.0:5000',
+        '--chdir', os.path.dirname(os.path.abspath(__file__)),
+        'web:app',
+    ]
+    try:
+        os.execvp('gunicorn', gunicorn_args)
+    except OSError:
+        # No gunicorn installed (or we're on Windows), the dev server still works
+        logger.warning("Couldn't start gunicorn, falling back to the Flask dev server")
+        app.run(host='0.0.0.0', port=5000)
 
 if __name__ == '__main__':
     start_server()